@@ -1,9 +1,8 @@
 import streamlit as st
-import faiss
 import pickle
 import os
 from openai import OpenAI
-from modules import agentic_core as custom_agent, data_acquisition, retriever, llm_clients, query_transformations
+from modules import agentic_core as custom_agent, data_acquisition, retriever, llm_clients, query_transformations, sharding, quantization, kb_snapshots, chat_history
 from llama_index_modules import LlamaIndex_agent
 
 # --- PAGE CONFIGURATION ---
@@ -50,47 +49,53 @@ with st.sidebar:
         st.warning(f"⚠️ Key for {st.session_state.llm_choice} is not set or invalid.")
 
 # --- KNOWLEDGE BASE LOADING ---
-@st.cache_resource(show_spinner="Initializing Custom Knowledge Bases...")
-def load_custom_kbs():
+KB_PROBE_QUERIES = ["HSA contribution limits", "medical expense deduction", "individual mandate tax penalty"]
+
+def load_custom_kbs(kb_dir="knowledge_stores"):
+    """
+    Loads the custom knowledge bases from a snapshot directory (or the legacy flat layout).
+    Raises FileNotFoundError if a snapshot is missing the IRS or cases index.
+    """
     knowledge_bases = {'irs': (None, None), 'cases': (None, None)}
-    if os.path.exists("knowledge_stores/irs_faiss_index.bin"):
-        irs_index = faiss.read_index("knowledge_stores/irs_faiss_index.bin")
-        with open("knowledge_stores/irs_chunks.pkl", "rb") as f: irs_chunks = pickle.load(f)
-        knowledge_bases['irs'] = (irs_chunks, irs_index)
-    if os.path.exists("knowledge_stores/cases_faiss_index.bin"):
-        cases_index = faiss.read_index("knowledge_stores/cases_faiss_index.bin")
-        with open("knowledge_stores/cases_chunks.pkl", "rb") as f: cases_chunks = pickle.load(f)
-        knowledge_bases['cases'] = (cases_chunks, cases_index)
+    # With KB_USE_SHARDS=1, use per-source shards (routed + searched in parallel) when the build produced them
+    for kb_name in (knowledge_bases if sharding.USE_SHARDS else ()):
+        shard_chunks, shard_index = sharding.load_shards(os.path.join(kb_dir, f"{kb_name}_shards"))
+        if shard_index is not None:
+            knowledge_bases[kb_name] = (shard_chunks, shard_index)
+    for kb_name in knowledge_bases:
+        if knowledge_bases[kb_name][1] is None and os.path.exists(os.path.join(kb_dir, f"{kb_name}_faiss_index.bin")):
+            kb_index = quantization.load_index(os.path.join(kb_dir, f"{kb_name}_faiss_index"))
+            with open(os.path.join(kb_dir, f"{kb_name}_chunks.pkl"), "rb") as f: kb_chunks = pickle.load(f)
+            knowledge_bases[kb_name] = (kb_chunks, kb_index)
+    # A published snapshot must be complete; raising keeps the reloader on the live version
+    if os.path.exists(os.path.join(kb_dir, kb_snapshots.MANIFEST_FILE)):
+        missing = [kb_name for kb_name, (_, kb_index) in knowledge_bases.items() if kb_index is None]
+        if missing:
+            raise FileNotFoundError(f"Snapshot '{kb_dir}' has no index for: {', '.join(missing)}.")
     return knowledge_bases
 
+def warm_custom_kbs(knowledge_bases):
+    """Runs a few probe searches so a freshly loaded snapshot is paged in before it goes live."""
+    for chunks, index in knowledge_bases.values():
+        if index is not None:
+            for query in KB_PROBE_QUERIES:
+                retriever.retrieve_context(query, chunks, index)
+
+@st.cache_resource(show_spinner="Initializing Custom Knowledge Bases...")
+def get_custom_kb_reloader():
+    # Watches knowledge_stores/CURRENT and swaps in rebuilt snapshots without a restart
+    return kb_snapshots.HotReloader("knowledge_stores", load_custom_kbs, probe=warm_custom_kbs)
+
 # --- MAIN APP INTERFACE ---
 st.title("⚕️ Healthcare Taxation Assistant")
 st.caption(f"Using: **{st.session_state.framework_choice}** | Strategy: **{st.session_state.retrieval_strategy}** | Model: **{st.session_state.llm_choice}**")
 
 if st.session_state.framework_choice == "Custom Code":
-    knowledge_bases = load_custom_kbs()
+    knowledge_bases = get_custom_kb_reloader().get()
 
-# Display chat history
-for msg in st.session_state.messages:
-    with st.chat_message(msg["role"]):
-        st.markdown(msg.get("content", ""))
-        if msg["role"] == "user" and msg.get("label"):
-            st.caption(msg["label"])
-        
-        if msg["role"] == "assistant":
-            if msg.get("query_transformation") and msg["query_transformation"].get("content"):
-                with st.expander("Show Query Transformation"):
-                    st.subheader(msg["query_transformation"]["title"])
-                    st.info(msg["query_transformation"]["content"])
-            if msg.get("thought_process"):
-                with st.expander("Show Self-Correction Process"):
-                    st.info(f"**Sources:** {', '.join(msg['thought_process']['sources'])}")
-                    st.warning(f"**Initial Draft:**\n{msg['thought_process']['initial']}")
-                    st.error(f"**Critique:**\n{msg['thought_process']['critique']}")
-            if msg.get("full_analysis"):
-                with st.expander("Show Full Agentic Analysis"):
-                    st.code(f"Agent's Plan:\n{msg['full_analysis']['plan']}", language="text")
-                    st.success(f"**Legal & Web Analysis:**\n{msg['full_analysis']['agent_response']}")
+# Display chat history (windowed; heavy per-turn artifacts live in a side store and load on demand)
+artifact_store = chat_history.get_artifact_store()
+chat_history.render_history(st.session_state.messages, artifact_store)
 
 # Handles chat input and response generation
 if prompt := st.chat_input("Ask about healthcare tax rules..."):
@@ -149,20 +154,8 @@ if st.session_state.messages[-1]["role"] == "user":
         
         # Display the new response and its expanders
         st.markdown(final_response)
-        if "query_transformation" in message_to_save and message_to_save["query_transformation"].get("content"):
-            with st.expander("Show Query Transformation"):
-                st.subheader(message_to_save["query_transformation"]["title"])
-                st.info(message_to_save["query_transformation"]["content"])
-        if "thought_process" in message_to_save:
-            with st.expander("Show Self-Correction Process"):
-                st.info(f"**Sources:** {', '.join(message_to_save['thought_process']['sources'])}")
-                st.warning(f"**Initial Draft:**\n{message_to_save['thought_process']['initial']}")
-                st.error(f"**Critique:**\n{message_to_save['thought_process']['critique']}")
-        if "full_analysis" in message_to_save:
-            with st.expander("Show Full Agentic Analysis"):
-                st.code(f"Agent's Plan:\n{message_to_save['full_analysis']['plan']}", language="text")
-                st.success(f"**Legal & Web Analysis:**\n{message_to_save['full_analysis']['agent_response']}")
+        chat_history.render_artifacts(message_to_save)
         
-        # Save the complete assistant message to history
+        # Save the assistant message to history, moving its artifacts to the side store
         message_to_save["content"] = final_response
-        st.session_state.messages.append(message_to_save)
\ No newline at end of file
+        st.session_state.messages.append(chat_history.compact_message(message_to_save, artifact_store))
\ No newline at end of file
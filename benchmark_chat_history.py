@@ -0,0 +1,75 @@
+# benchmark_chat_history.py
+# Measures Streamlit rerun time against conversation length for the original
+# full-replay history and the windowed history with side-stored artifacts.
+import time
+import tempfile
+from streamlit.testing.v1 import AppTest
+from modules import chat_history
+
+TURN_COUNTS = (5, 25, 100, 250)
+REPEATS = 5
+# Roughly the size of a real turn: a few KB each of draft, critique and agent output
+FILLER = "The annual HSA contribution limit depends on self-only or family HDHP coverage. " * 40
+
+def full_replay_app():
+    import streamlit as st
+    for msg in st.session_state.messages:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg.get("content", ""))
+            if msg["role"] == "user" and msg.get("label"):
+                st.caption(msg["label"])
+            if msg["role"] == "assistant":
+                if msg.get("query_transformation") and msg["query_transformation"].get("content"):
+                    with st.expander("Show Query Transformation"):
+                        st.subheader(msg["query_transformation"]["title"])
+                        st.info(msg["query_transformation"]["content"])
+                if msg.get("thought_process"):
+                    with st.expander("Show Self-Correction Process"):
+                        st.info(f"**Sources:** {', '.join(msg['thought_process']['sources'])}")
+                        st.warning(f"**Initial Draft:**\n{msg['thought_process']['initial']}")
+                        st.error(f"**Critique:**\n{msg['thought_process']['critique']}")
+                if msg.get("full_analysis"):
+                    with st.expander("Show Full Agentic Analysis"):
+                        st.code(f"Agent's Plan:\n{msg['full_analysis']['plan']}", language="text")
+                        st.success(f"**Legal & Web Analysis:**\n{msg['full_analysis']['agent_response']}")
+
+def windowed_app():
+    import streamlit as st
+    from modules import chat_history
+    chat_history.render_history(st.session_state.messages, st.session_state.artifact_store)
+
+def make_turns(num_turns):
+    messages = []
+    for turn in range(num_turns):
+        messages.append({"role": "user", "content": f"Question {turn} show legal precedent", "label": "Framework: Custom Code | Strategy: HyDE | Model: OpenAI (GPT-4o)"})
+        messages.append({
+            "role": "assistant",
+            "content": f"Answer {turn}: {FILLER[:400]}",
+            "query_transformation": {"title": "HyDE: Hypothetical Document", "content": FILLER},
+            "thought_process": {"initial": FILLER, "critique": FILLER, "final": FILLER, "sources": ["Pub 969", "Pub 502"]},
+            "full_analysis": {"plan": FILLER, "agent_response": FILLER * 2},
+        })
+    return messages
+
+def time_reruns(app_fn, session_state):
+    at = AppTest.from_function(app_fn, default_timeout=60)
+    for key, value in session_state.items():
+        at.session_state[key] = value
+    at.run()  # first run pays import and script-compile cost
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        at.run()
+    return (time.perf_counter() - start) * 1000 / REPEATS
+
+if __name__ == "__main__":
+    print(f"{'turns':>6}{'full replay ms':>16}{'windowed ms':>14}{'session KB (full)':>20}{'session KB (windowed)':>24}")
+    for num_turns in TURN_COUNTS:
+        messages = make_turns(num_turns)
+        store = chat_history.ArtifactStore(tempfile.mkdtemp())
+        compact_messages = [chat_history.compact_message(msg, store) for msg in messages]
+        full_kb = sum(len(str(msg)) for msg in messages) / 1024
+        compact_kb = sum(len(str(msg)) for msg in compact_messages) / 1024
+
+        full_ms = time_reruns(full_replay_app, {"messages": messages})
+        windowed_ms = time_reruns(windowed_app, {"messages": compact_messages, "artifact_store": store})
+        print(f"{num_turns:>6}{full_ms:>16.1f}{windowed_ms:>14.1f}{full_kb:>20.1f}{compact_kb:>24.1f}")
@@ -0,0 +1,44 @@
+# benchmark_quantization.py
+# Reports the memory, latency and recall trade-offs of each vector storage format
+# (flat float32, fp16, sq8, pq; quantized formats with and without exact re-scoring).
+# Run after `build_knowledge_base.py` (or `build_all_kbs.py`) has built the knowledge stores.
+import os
+import faiss
+import numpy as np
+from modules import retriever, quantization, kb_snapshots
+from benchmark_shards import PROBE_QUERIES, TOP_K, time_search
+
+_, kb_dir = kb_snapshots.current_snapshot("knowledge_stores")
+RESCORE_FACTOR = 4
+
+def recall_at_k(ids, expected_ids):
+    return np.mean([len(set(row) & set(expected)) / TOP_K for row, expected in zip(ids, expected_ids)])
+
+def benchmark(kb_name, query_embeddings):
+    index_path = os.path.join(kb_dir, f"{kb_name}_faiss_index.bin")
+    if not os.path.exists(index_path):
+        print(f"⚠️ Skipping '{kb_name}': '{index_path}' has not been built.")
+        return
+
+    stored_index = faiss.read_index(index_path)
+    vectors = stored_index.reconstruct_n(0, stored_index.ntotal)
+    flat_index = quantization.build_quantized_index(vectors, "flat")
+    _, expected_ids = flat_index.search(query_embeddings, TOP_K)
+
+    print(f"\n=== {kb_name}: {vectors.shape[0]} vectors x {vectors.shape[1]} dims ===")
+    print(f"{'format':<16}{'index KB':>10}{'ms/query':>10}{'recall@' + str(TOP_K):>10}")
+    for fmt in quantization.FORMATS:
+        index = flat_index if fmt == "flat" else quantization.build_quantized_index(vectors, fmt)
+        index_kb = faiss.serialize_index(index).nbytes / 1024
+        _, ids = index.search(query_embeddings, TOP_K)
+        print(f"{fmt:<16}{index_kb:>10.1f}{time_search(index, query_embeddings):>10.3f}{recall_at_k(ids, expected_ids):>10.2f}")
+        if fmt != "flat":
+            # Raw vectors for re-scoring are memory-mapped and shared across workers, so they are not counted per worker.
+            rescored = quantization.RescoredIndex(index, vectors, rescore_factor=RESCORE_FACTOR)
+            _, ids = rescored.search(query_embeddings, TOP_K)
+            print(f"{fmt + ' +rescore':<16}{index_kb:>10.1f}{time_search(rescored, query_embeddings):>10.3f}{recall_at_k(ids, expected_ids):>10.2f}")
+
+if __name__ == "__main__":
+    query_embeddings = np.array(retriever.get_embedding_model().encode(PROBE_QUERIES)).astype('float32')
+    for kb_name in ("irs", "cases"):
+        benchmark(kb_name, query_embeddings)
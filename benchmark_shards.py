@@ -0,0 +1,66 @@
+# benchmark_shards.py
+# Compares the monolithic FAISS indexes against the routed, per-source shards.
+# Run after `build_knowledge_base.py` (or `build_all_kbs.py`) has produced both layouts.
+import os
+import time
+import pickle
+import faiss
+import numpy as np
+from modules import retriever, sharding, kb_snapshots
+
+_, kb_dir = kb_snapshots.current_snapshot("knowledge_stores")
+
+PROBE_QUERIES = [
+    "What is the HSA contribution limit for family coverage?",
+    "Can I deduct long-term care insurance premiums as a medical expense?",
+    "Are employer-provided health benefits taxable fringe benefits?",
+    "How are required minimum distributions from an IRA taxed?",
+    "What did the Supreme Court decide about the individual mandate?",
+    "Does the contraceptive mandate apply to closely held corporations?",
+    "Are premium tax credits available on federal exchanges?",
+    "Which preventive services must insurers cover without cost sharing?",
+]
+TOP_K = 5
+REPEATS = 20
+
+def time_search(index, query_embeddings):
+    index.search(query_embeddings, TOP_K)  # warm-up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for row in range(len(query_embeddings)):
+            index.search(query_embeddings[row:row + 1], TOP_K)
+    return (time.perf_counter() - start) * 1000 / (REPEATS * len(query_embeddings))
+
+def benchmark(kb_name, top_n_values=(1, 3, 5)):
+    index_path = os.path.join(kb_dir, f"{kb_name}_faiss_index.bin")
+    shard_dir = os.path.join(kb_dir, f"{kb_name}_shards")
+    if not os.path.exists(index_path) or not os.path.exists(os.path.join(shard_dir, sharding.MANIFEST_FILE)):
+        print(f"⚠️ Skipping '{kb_name}': build both the monolithic index and its shards first.")
+        return
+
+    mono_index = faiss.read_index(index_path)
+    with open(os.path.join(kb_dir, f"{kb_name}_chunks.pkl"), "rb") as f:
+        mono_chunks = pickle.load(f)
+    query_embeddings = np.array(retriever.get_embedding_model().encode(PROBE_QUERIES)).astype('float32')
+
+    _, mono_ids = mono_index.search(query_embeddings, TOP_K)
+    mono_hits = [{mono_chunks[i]['text'] for i in row if i != -1} for row in mono_ids]
+    mono_ms = time_search(mono_index, query_embeddings)
+
+    print(f"\n=== {kb_name}: {mono_index.ntotal} vectors ===")
+    print(f"{'layout':<22}{'shards searched':>16}{'ms/query':>10}{'recall@' + str(TOP_K):>10}")
+    print(f"{'monolithic':<22}{'-':>16}{mono_ms:>10.3f}{1.0:>10.2f}")
+    for top_n in top_n_values:
+        shard_chunks, shard_index = sharding.load_shards(shard_dir, top_n_shards=top_n)
+        _, shard_ids = shard_index.search(query_embeddings, TOP_K)
+        recall = np.mean([
+            len({shard_chunks[i]['text'] for i in row if i != -1} & expected) / max(1, len(expected))
+            for row, expected in zip(shard_ids, mono_hits)
+        ])
+        shard_ms = time_search(shard_index, query_embeddings)
+        searched = f"{min(top_n, len(shard_index.indexes))}/{len(shard_index.indexes)}"
+        print(f"{'sharded (top-' + str(top_n) + ')':<22}{searched:>16}{shard_ms:>10.3f}{recall:>10.2f}")
+
+if __name__ == "__main__":
+    for kb_name in ("irs", "cases"):
+        benchmark(kb_name)
@@ -1,8 +1,7 @@
 # build_all_kbs.py
 import os
-from modules import data_acquisition as custom_da, retriever as custom_retriever
+from modules import data_acquisition as custom_da, retriever as custom_retriever, sharding, quantization, kb_snapshots
 from llama_index_modules import LlamaIndex_builder
-import faiss
 import pickle
 
 print("🚀 Starting Unified Knowledge Base build process...")
@@ -11,27 +10,59 @@ os.makedirs("llama_index_stores", exist_ok=True)
 os.makedirs("debug_outputs", exist_ok=True)
 print("✅ Ensured all output directories exist.")
 
-# --- 1. Build for Custom Framework ---
-print("\n--- Building for Custom Framework ---")
-# ... (This is the logic from your previous build_knowledge_base.py)
-# ... (It saves to the 'knowledge_stores' directory)
-publication_urls = custom_da.load_urls_from_file()
-irs_content = {name: content for name, url in publication_urls.items() if (content := custom_da.scrape_publication(name, url))}
-if irs_content:
-    irs_chunks, irs_faiss_index = custom_retriever.build_faiss_index(irs_content)
-    faiss.write_index(irs_faiss_index, "knowledge_stores/irs_faiss_index.bin")
-    with open("knowledge_stores/irs_chunks.pkl", "wb") as f: pickle.dump(irs_chunks, f)
-    print("✅ Custom IRS Knowledge Base built.")
-legal_cases_content = custom_da.extract_text_from_pdfs("source_documents/legal_cases")
-if legal_cases_content:
-    case_chunks, case_faiss_index = custom_retriever.build_faiss_index(legal_cases_content)
-    faiss.write_index(case_faiss_index, "knowledge_stores/cases_faiss_index.bin")
-    with open("knowledge_stores/cases_chunks.pkl", "wb") as f: pickle.dump(case_chunks, f)
-    print("✅ Custom Legal Cases Knowledge Base built.")
+# Each framework builds into a fresh versioned snapshot that the running app hot-swaps once published.
+# Any failure discards the unpublished snapshot so partial builds never pile up on disk.
+custom_version, custom_dir = kb_snapshots.new_snapshot_dir("knowledge_stores")
+try:
+    # --- 1. Build for Custom Framework ---
+    print("\n--- Building for Custom Framework ---")
+    # ... (This is the logic from your previous build_knowledge_base.py)
+    # ... (It saves to a snapshot under the 'knowledge_stores' directory)
+    publication_urls = custom_da.load_urls_from_file()
+    irs_content = {name: content for name, url in publication_urls.items() if (content := custom_da.scrape_publication(name, url))}
+    if irs_content:
+        irs_chunks, irs_faiss_index = custom_retriever.build_faiss_index(irs_content, deduplicate=True)
+        quantization.save_index_formats(irs_faiss_index, os.path.join(custom_dir, "irs_faiss_index"))
+        with open(os.path.join(custom_dir, "irs_chunks.pkl"), "wb") as f: pickle.dump(irs_chunks, f)
+        sharding.save_shards(sharding.shard_faiss_index(irs_chunks, irs_faiss_index), os.path.join(custom_dir, "irs_shards"))
+        print("✅ Custom IRS Knowledge Base built.")
+    legal_cases_content = custom_da.extract_text_from_pdfs("source_documents/legal_cases")
+    if legal_cases_content:
+        case_chunks, case_faiss_index = custom_retriever.build_faiss_index(legal_cases_content, deduplicate=True)
+        quantization.save_index_formats(case_faiss_index, os.path.join(custom_dir, "cases_faiss_index"))
+        with open(os.path.join(custom_dir, "cases_chunks.pkl"), "wb") as f: pickle.dump(case_chunks, f)
+        sharding.save_shards(sharding.shard_faiss_index(case_chunks, case_faiss_index), os.path.join(custom_dir, "cases_shards"))
+        print("✅ Custom Legal Cases Knowledge Base built.")
+except BaseException:
+    kb_snapshots.discard_snapshot("knowledge_stores", custom_version)
+    print(f"❌ Custom build failed. Snapshot '{custom_version}' was discarded.")
+    raise
 
-# --- 2. Build for LlamaIndex Framework ---
-print("\n--- Building for LlamaIndex Framework ---")
-LlamaIndex_builder.build_irs_index()
-LlamaIndex_builder.build_cases_index()
+# Publish the custom snapshot before the LlamaIndex step so a failure there cannot lose it
+if irs_content and legal_cases_content:
+    kb_snapshots.publish_snapshot("knowledge_stores", custom_version)
+    print(f"✅ Published custom snapshot '{custom_version}'.")
+else:
+    kb_snapshots.discard_snapshot("knowledge_stores", custom_version)
+    print(f"⚠️ Custom snapshot '{custom_version}' is incomplete and was discarded.")
+
+llama_version, llama_dir = kb_snapshots.new_snapshot_dir("llama_index_stores")
+try:
+    # --- 2. Build for LlamaIndex Framework ---
+    print("\n--- Building for LlamaIndex Framework ---")
+    LlamaIndex_builder.build_irs_index(save_dir=os.path.join(llama_dir, "irs_index"))
+    LlamaIndex_builder.build_cases_index(save_dir=os.path.join(llama_dir, "cases_index"))
+except BaseException:
+    kb_snapshots.discard_snapshot("llama_index_stores", llama_version)
+    print(f"❌ LlamaIndex build failed. Snapshot '{llama_version}' was discarded.")
+    raise
+
+# --- 3. Publish the LlamaIndex snapshot ---
+if os.path.isdir(os.path.join(llama_dir, "irs_index")) and os.path.isdir(os.path.join(llama_dir, "cases_index")):
+    kb_snapshots.publish_snapshot("llama_index_stores", llama_version)
+    print(f"✅ Published LlamaIndex snapshot '{llama_version}'.")
+else:
+    kb_snapshots.discard_snapshot("llama_index_stores", llama_version)
+    print(f"⚠️ LlamaIndex snapshot '{llama_version}' is incomplete and was discarded.")
 
 print("\n✨ Unified build process complete.")
\ No newline at end of file
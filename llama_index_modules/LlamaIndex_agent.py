@@ -1,4 +1,5 @@
 # llama_index_modules/LlamaIndex_agent.py
+import os
 import streamlit as st
 from llama_index.core import StorageContext, load_index_from_storage, Settings
 from llama_index.core.tools import QueryEngineTool, FunctionTool
@@ -8,6 +9,7 @@ from llama_index.core.query_engine import SubQuestionQueryEngine
 from googlesearch import search
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index_modules import query_transformations
+from modules import kb_snapshots
 from llama_index.core.callbacks import CallbackManager, LlamaDebugHandler
 
 Settings.embed_model = HuggingFaceEmbedding(model_name="all-MiniLM-L6-v2")
@@ -20,14 +22,36 @@ def web_search_tool(query: str) -> str:
     except Exception as e:
         return f"Web search failed: {e}"
 
+LLAMA_PROBE_QUERIES = ["HSA contribution limits", "individual mandate tax penalty"]
+
+def _load_llama_index_snapshot(store_dir):
+    """Loads the IRS and cases vector stores persisted under a snapshot directory."""
+    irs_index = load_index_from_storage(StorageContext.from_defaults(persist_dir=os.path.join(store_dir, "irs_index")))
+    cases_index = load_index_from_storage(StorageContext.from_defaults(persist_dir=os.path.join(store_dir, "cases_index")))
+    return {"irs": irs_index, "cases": cases_index}
+
+def _warm_llama_indexes(indexes):
+    """Embeds and retrieves a few probe queries so a new snapshot is warm before it is swapped in."""
+    for index in indexes.values():
+        retriever = index.as_retriever(similarity_top_k=2)
+        for query in LLAMA_PROBE_QUERIES:
+            retriever.retrieve(query)
+
 @st.cache_resource(show_spinner="Loading LlamaIndex knowledge bases...")
+def get_llama_index_reloader():
+    """
+    Loads the pre-built LlamaIndex vector stores and watches for rebuilt snapshots.
+    Raises FileNotFoundError if they are missing; st.cache_resource does not cache
+    exceptions, so stores built later are picked up on the next call without a restart.
+    """
+    reloader = kb_snapshots.HotReloader("llama_index_stores", _load_llama_index_snapshot, probe=_warm_llama_indexes)
+    st.sidebar.success("LlamaIndex KBs loaded.")
+    return reloader
+
 def load_llama_index_kbs():
-    """Loads the pre-built LlamaIndex vector stores from disk."""
+    """Returns the live LlamaIndex vector stores, or None if they have not been built."""
     try:
-        irs_index = load_index_from_storage(StorageContext.from_defaults(persist_dir="llama_index_stores/irs_index"))
-        cases_index = load_index_from_storage(StorageContext.from_defaults(persist_dir="llama_index_stores/cases_index"))
-        st.sidebar.success("LlamaIndex KBs loaded.")
-        return {"irs": irs_index, "cases": cases_index}
+        return get_llama_index_reloader().get()
     except FileNotFoundError:
         st.error("LlamaIndex stores not found. Please run `build_all_kbs.py`.")
         return None
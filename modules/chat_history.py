@@ -0,0 +1,139 @@
+# modules/chat_history.py
+import os
+import json
+import time
+import uuid
+import zlib
+import shutil
+import weakref
+import tempfile
+import streamlit as st
+
+# Heavy per-turn artifacts kept out of st.session_state.messages and loaded on demand
+ARTIFACT_KEYS = ("query_transformation", "thought_process", "full_analysis")
+HISTORY_PAGE_SIZE = 10
+ARTIFACT_ROOT = os.path.join(tempfile.gettempdir(), "healthcare_tax_assistant_history")
+# Session directories untouched for this long are assumed abandoned (e.g. after a crash)
+ARTIFACT_TTL_SECONDS = 24 * 60 * 60
+# Directories owned by stores still alive in this process; never pruned, however long they sit idle
+_LIVE_SESSION_DIRS = set()
+
+def prune_stale_sessions(root=ARTIFACT_ROOT, ttl_seconds=ARTIFACT_TTL_SECONDS):
+    """
+    Removes session directories under `root` that are not owned by a live store
+    in this process and have not been used within `ttl_seconds`.
+    """
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - ttl_seconds
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if path in _LIVE_SESSION_DIRS:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+def _remove_session_dir(session_dir):
+    _LIVE_SESSION_DIRS.discard(session_dir)
+    shutil.rmtree(session_dir, ignore_errors=True)
+
+class ArtifactStore:
+    """
+    A compact side store for per-turn artifacts (draft, critique, agent output...).
+    Each turn is written as zlib-compressed JSON in a per-session temp directory,
+    so only the visible message text stays in session memory. The directory is
+    removed when the store is garbage collected (i.e. the session ends), and
+    directories left behind by crashed processes expire after ARTIFACT_TTL_SECONDS
+    without use. Every access refreshes the directory's mtime.
+    """
+    def __init__(self, session_dir=None):
+        if session_dir is None:
+            prune_stale_sessions()
+            session_dir = os.path.join(ARTIFACT_ROOT, uuid.uuid4().hex)
+        self.session_dir = session_dir
+        os.makedirs(self.session_dir, exist_ok=True)
+        _LIVE_SESSION_DIRS.add(self.session_dir)
+        self._finalizer = weakref.finalize(self, _remove_session_dir, self.session_dir)
+
+    def touch(self):
+        """Marks the session as in use so other processes' TTL pruning leaves it alone."""
+        os.makedirs(self.session_dir, exist_ok=True)
+        os.utime(self.session_dir)
+
+    def _path(self, turn_id):
+        return os.path.join(self.session_dir, f"{turn_id}.json.z")
+
+    def put(self, turn_id, artifacts):
+        self.touch()
+        with open(self._path(turn_id), "wb") as f:
+            f.write(zlib.compress(json.dumps(artifacts).encode("utf-8")))
+
+    def get(self, turn_id):
+        self.touch()
+        try:
+            with open(self._path(turn_id), "rb") as f:
+                return json.loads(zlib.decompress(f.read()).decode("utf-8"))
+        except FileNotFoundError:
+            return {}
+
+def get_artifact_store():
+    """Returns this session's ArtifactStore, creating it on first use."""
+    if "artifact_store" not in st.session_state:
+        st.session_state.artifact_store = ArtifactStore()
+    # Called on every rerun, so any interaction keeps the session fresh
+    st.session_state.artifact_store.touch()
+    return st.session_state.artifact_store
+
+def compact_message(message, store):
+    """
+    Moves a message's heavy artifacts into `store` and returns the lightweight
+    entry kept in session state (role, content, label and a pointer to the artifacts).
+    """
+    artifacts = {key: message[key] for key in ARTIFACT_KEYS if message.get(key)}
+    compact = {key: value for key, value in message.items() if key not in ARTIFACT_KEYS}
+    if artifacts:
+        compact["turn_id"] = uuid.uuid4().hex
+        store.put(compact["turn_id"], artifacts)
+    return compact
+
+def render_artifacts(artifacts):
+    """Renders the query-transformation, self-correction and full-analysis expanders for one turn."""
+    if artifacts.get("query_transformation") and artifacts["query_transformation"].get("content"):
+        with st.expander("Show Query Transformation"):
+            st.subheader(artifacts["query_transformation"]["title"])
+            st.info(artifacts["query_transformation"]["content"])
+    if artifacts.get("thought_process"):
+        with st.expander("Show Self-Correction Process"):
+            st.info(f"**Sources:** {', '.join(artifacts['thought_process']['sources'])}")
+            st.warning(f"**Initial Draft:**\n{artifacts['thought_process']['initial']}")
+            st.error(f"**Critique:**\n{artifacts['thought_process']['critique']}")
+    if artifacts.get("full_analysis"):
+        with st.expander("Show Full Agentic Analysis"):
+            st.code(f"Agent's Plan:\n{artifacts['full_analysis']['plan']}", language="text")
+            st.success(f"**Legal & Web Analysis:**\n{artifacts['full_analysis']['agent_response']}")
+
+def _show_earlier_messages():
+    st.session_state.history_pages = st.session_state.get("history_pages", 1) + 1
+
+def render_history(messages, store, page_size=HISTORY_PAGE_SIZE):
+    """
+    Renders only the most recent `page_size * history_pages` messages so rerun
+    cost stays flat as the conversation grows. Artifacts of past turns are read
+    from `store` only when the user switches on that turn's details toggle.
+    """
+    visible = page_size * st.session_state.get("history_pages", 1)
+    hidden = max(0, len(messages) - visible)
+    if hidden:
+        st.button(f"Show earlier messages ({hidden} hidden)", on_click=_show_earlier_messages)
+
+    for msg in messages[hidden:]:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg.get("content", ""))
+            if msg["role"] == "user" and msg.get("label"):
+                st.caption(msg["label"])
+            if msg["role"] == "assistant" and msg.get("turn_id"):
+                if st.toggle("Show analysis details", key=f"details_{msg['turn_id']}"):
+                    render_artifacts(store.get(msg["turn_id"]))
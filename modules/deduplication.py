@@ -0,0 +1,78 @@
+# modules/deduplication.py
+import re
+import zlib
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def _shingles(text, shingle_size=5):
+    """Word n-gram shingles of a chunk, hashed to 32-bit ints. Case and whitespace are ignored."""
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < shingle_size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {zlib.crc32(' '.join(words[i:i + shingle_size]).encode('utf-8')) for i in range(len(words) - shingle_size + 1)}
+
+def _minhash_signature(shingles, perm_a, perm_b):
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    return (((hashes[:, None] * perm_a + perm_b) % _MERSENNE_PRIME) & _MAX_HASH).min(axis=0)
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def deduplicate_chunks(chunks, threshold=0.85, num_perm=128, bands=32, seed=42):
+    """
+    Collapses near-identical chunks using MinHash signatures with LSH banding.
+    All candidate pairs that share a band are confirmed with the exact Jaccard
+    similarity of their shingle sets (>= `threshold`) before being merged.
+    Each canonical chunk keeps the first occurrence's text and gains a
+    'sources' list of every source that contained a duplicate of it.
+    Returns (canonical_chunks, stats).
+    """
+    if not chunks:
+        return chunks, {"original": 0, "deduplicated": 0, "shrink_ratio": 0.0}
+
+    rng = np.random.RandomState(seed)
+    perm_a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+    perm_b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+    rows_per_band = num_perm // bands
+
+    shingle_sets = [_shingles(chunk['text']) for chunk in chunks]
+    signatures = np.array([_minhash_signature(s, perm_a, perm_b) for s in shingle_sets])
+
+    parents = list(range(len(chunks)))
+    for band in range(bands):
+        buckets = {}
+        band_slice = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for i, key in enumerate(map(bytes, band_slice)):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            # Check every pair in the bucket, not just against the first member, so b≈c is
+            # still found when neither matches a. Pairs already in one set are skipped.
+            for pos, first in enumerate(members):
+                for other in members[pos + 1:]:
+                    root_first, root_other = _find(parents, first), _find(parents, other)
+                    if root_first == root_other:
+                        continue
+                    a, b = shingle_sets[first], shingle_sets[other]
+                    if len(a & b) / len(a | b) >= threshold:
+                        parents[max(root_first, root_other)] = min(root_first, root_other)
+
+    canonical = {}
+    for i, chunk in enumerate(chunks):
+        root = _find(parents, i)
+        if root not in canonical:
+            canonical[root] = {**chunks[root], 'sources': []}
+        if chunk['source'] not in canonical[root]['sources']:
+            canonical[root]['sources'].append(chunk['source'])
+
+    deduplicated = [canonical[root] for root in sorted(canonical)]
+    stats = {
+        "original": len(chunks),
+        "deduplicated": len(deduplicated),
+        "shrink_ratio": 1 - len(deduplicated) / len(chunks),
+    }
+    return deduplicated, stats
@@ -0,0 +1,148 @@
+# modules/kb_snapshots.py
+import os
+import gc
+import json
+import time
+import uuid
+import shutil
+import threading
+
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_POINTER = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+def new_snapshot_dir(root):
+    """Creates an empty, versioned snapshot directory under `root` and returns (version, path)."""
+    # Fixed-width nanosecond timestamp so names sort in creation order even within one second;
+    # the random suffix only guards against two builds landing on the same nanosecond
+    now_ns = time.time_ns()
+    version = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now_ns // 10**9))}-{now_ns % 10**9:09d}-{uuid.uuid4().hex[:6]}"
+    path = os.path.join(root, SNAPSHOTS_DIR, version)
+    os.makedirs(path, exist_ok=False)
+    return version, path
+
+def publish_snapshot(root, version, metadata=None, keep=3):
+    """
+    Writes the snapshot's manifest and atomically repoints `root/CURRENT` at it.
+    Readers either see the previous version or the new one, never a partial build.
+    Older snapshots beyond `keep` are removed.
+    """
+    path = os.path.join(root, SNAPSHOTS_DIR, version)
+    manifest = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": sorted(os.path.relpath(os.path.join(d, f), path) for d, _, files in os.walk(path) for f in files),
+        **(metadata or {}),
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    pointer_path = os.path.join(root, CURRENT_POINTER)
+    tmp_path = pointer_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, pointer_path)
+    prune_snapshots(root, keep=keep)
+
+def discard_snapshot(root, version):
+    """Deletes an unpublished (e.g. incomplete) snapshot directory."""
+    shutil.rmtree(os.path.join(root, SNAPSHOTS_DIR, version), ignore_errors=True)
+
+def current_snapshot(root):
+    """
+    Returns (version, path) of the live snapshot. Stores built before snapshots
+    existed have no CURRENT pointer, in which case `root` itself is returned.
+    """
+    pointer_path = os.path.join(root, CURRENT_POINTER)
+    if not os.path.exists(pointer_path):
+        return None, root
+    with open(pointer_path, "r") as f:
+        version = f.read().strip()
+    return version, os.path.join(root, SNAPSHOTS_DIR, version)
+
+def validate_snapshot(path):
+    """Raises FileNotFoundError unless `path` has a manifest and every file it lists is present."""
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Snapshot '{path}' has no {MANIFEST_FILE}.")
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    missing = [name for name in manifest.get("files", []) if not os.path.exists(os.path.join(path, name))]
+    if missing:
+        raise FileNotFoundError(f"Snapshot '{path}' is missing {len(missing)} file(s), e.g. '{missing[0]}'.")
+
+def prune_snapshots(root, keep=3):
+    """
+    Deletes all but the newest `keep` published snapshots, never touching the live one.
+    Only directories with a manifest count, so builds in progress and failed builds
+    cannot push out good snapshots that could still be rolled back to.
+    """
+    snapshots_root = os.path.join(root, SNAPSHOTS_DIR)
+    if not os.path.isdir(snapshots_root):
+        return
+    live_version, _ = current_snapshot(root)
+    versions = sorted(
+        (v for v in os.listdir(snapshots_root) if os.path.exists(os.path.join(snapshots_root, v, MANIFEST_FILE))),
+        reverse=True,
+    )
+    for version in versions[keep:]:
+        if version != live_version:
+            shutil.rmtree(os.path.join(snapshots_root, version), ignore_errors=True)
+
+class HotReloader:
+    """
+    Holds the live knowledge base loaded from `root`'s current snapshot and
+    polls the CURRENT pointer in a background thread. When it moves, the new
+    snapshot is loaded alongside the live one, warmed with `probe`, and swapped
+    in under a lock. Requests that already called `get()` keep their reference
+    and finish on the old version, which is freed once they let go of it.
+    A snapshot is only swapped in if it validates and `loader` returns without
+    raising, so loaders must raise on incomplete knowledge bases.
+    """
+    def __init__(self, root, loader, probe=None, poll_interval=30):
+        self.root = root
+        self.loader = loader
+        self.probe = probe
+        self.poll_interval = poll_interval
+        self.version, path = current_snapshot(root)
+        if self.version is not None:
+            validate_snapshot(path)
+        self._current = loader(path)
+        self._failed_version = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._watch, name=f"kb-reloader-{os.path.basename(root)}", daemon=True)
+        self._thread.start()
+
+    def get(self):
+        with self._lock:
+            return self._current
+
+    def reload_if_changed(self):
+        """Loads, warms and swaps in the current snapshot if it differs from the live one."""
+        version, path = current_snapshot(self.root)
+        if version in (self.version, self._failed_version):
+            return False
+        try:
+            validate_snapshot(path)
+            new_kb = self.loader(path)
+        except Exception:
+            # Remember the bad version so it is not reloaded on every poll; a new publish is retried.
+            self._failed_version = version
+            raise
+        if self.probe:
+            self.probe(new_kb)
+        with self._lock:
+            old_kb, self._current, self.version = self._current, new_kb, version
+        print(f"🔄 Swapped '{self.root}' to snapshot {version}.")
+        del old_kb
+        gc.collect()
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                # A broken snapshot is never swapped in; the live one keeps serving.
+                print(f"⚠️ Failed to hot-reload '{self.root}': {e}")
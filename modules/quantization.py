@@ -0,0 +1,110 @@
+# modules/quantization.py
+import os
+import numpy as np
+import faiss
+
+# Storage formats for knowledge-base vectors. "flat" is the original float32 IndexFlatL2.
+FORMATS = ("flat", "fp16", "sq8", "pq")
+# Selects the format the app loads; falls back to "flat" when the quantized files are missing.
+INDEX_FORMAT = os.environ.get("KB_INDEX_FORMAT", "flat")
+
+def _index_path(stem, fmt):
+    return f"{stem}.bin" if fmt == "flat" else f"{stem}_{fmt}.bin"
+
+def _vectors_path(stem):
+    return f"{stem}_vectors.npy"
+
+def build_quantized_index(vectors, fmt, pq_subquantizers=48):
+    """
+    Builds a FAISS index over float32 `vectors` in the requested storage format.
+    fp16/sq8 use a scalar quantizer (2 or 1 byte per dimension); pq uses product
+    quantization with `pq_subquantizers` codes per vector.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    num_vectors, dimension = vectors.shape
+    if fmt == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif fmt == "fp16":
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    elif fmt == "sq8" or (fmt == "pq" and num_vectors < 2):
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif fmt == "pq":
+        if dimension % pq_subquantizers != 0:
+            pq_subquantizers = next(m for m in range(pq_subquantizers, 0, -1) if dimension % m == 0)
+        # Small shards cannot train 256 centroids per sub-space, so shrink the codebook to fit.
+        nbits = max(1, min(8, int(np.log2(num_vectors))))
+        index = faiss.IndexPQ(dimension, pq_subquantizers, nbits, faiss.METRIC_L2)
+        # Our corpora are far below FAISS's recommended 39 points per centroid; silence that warning.
+        index.pq.cp.min_points_per_centroid = 1
+    else:
+        raise ValueError(f"Unknown index format '{fmt}'. Expected one of {FORMATS}.")
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+def save_index_formats(index, stem, formats=FORMATS):
+    """
+    Writes `index` (a flat index from `retriever.build_faiss_index`) in each of
+    `formats`, plus the raw float32 vectors as an .npy file used for exact re-scoring.
+    """
+    vectors = index.reconstruct_n(0, index.ntotal)
+    np.save(_vectors_path(stem), vectors)
+    for fmt in formats:
+        target = index if fmt == "flat" else build_quantized_index(vectors, fmt)
+        faiss.write_index(target, _index_path(stem, fmt))
+
+def read_index_mmap(path):
+    """Reads a FAISS index memory-mapped so that workers share pages instead of each holding a copy."""
+    # IO_FLAG_MMAP_IFC maps flat/scalar/PQ codes on newer FAISS; older builds only honour IO_FLAG_MMAP.
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+def load_index(stem, fmt=None, rescore_factor=4):
+    """
+    Loads the index stored under `stem` in format `fmt` (default: INDEX_FORMAT).
+    Quantized formats are wrapped in a RescoredIndex when the raw vectors are available.
+    Falls back to the flat index if the quantized file has not been built.
+    """
+    fmt = fmt or INDEX_FORMAT
+    if fmt != "flat" and not os.path.exists(_index_path(stem, fmt)):
+        fmt = "flat"
+    index = read_index_mmap(_index_path(stem, fmt))
+    if fmt == "flat" or not os.path.exists(_vectors_path(stem)):
+        return index
+    vectors = np.load(_vectors_path(stem), mmap_mode='r')
+    return RescoredIndex(index, vectors, rescore_factor=rescore_factor)
+
+class RescoredIndex:
+    """
+    Searches a quantized index for `top_k * rescore_factor` candidates, then
+    re-ranks only those candidates with exact L2 distances against the
+    memory-mapped float32 vectors. Exposes the FAISS `search`/`ntotal`/`d` surface.
+    """
+    def __init__(self, index, vectors, rescore_factor=4):
+        self.index = index
+        self.vectors = vectors
+        self.rescore_factor = rescore_factor
+        self.ntotal = index.ntotal
+        self.d = index.d
+
+    def search(self, query_embeddings, top_k):
+        query_embeddings = np.asarray(query_embeddings, dtype='float32')
+        num_candidates = min(self.ntotal, top_k * self.rescore_factor)
+        _, candidate_ids = self.index.search(query_embeddings, num_candidates)
+
+        all_distances = np.full((len(query_embeddings), top_k), np.inf, dtype='float32')
+        all_indices = np.full((len(query_embeddings), top_k), -1, dtype='int64')
+        for row, (query_embedding, candidates) in enumerate(zip(query_embeddings, candidate_ids)):
+            candidates = np.sort(candidates[candidates != -1])
+            if len(candidates) == 0:
+                continue
+            exact = np.sum((np.asarray(self.vectors[candidates]) - query_embedding) ** 2, axis=1)
+            order = np.argsort(exact)[:top_k]
+            all_distances[row, :len(order)] = exact[order]
+            all_indices[row, :len(order)] = candidates[order]
+        return all_distances, all_indices
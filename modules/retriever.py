@@ -4,16 +4,18 @@ import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from modules import deduplication
 
 @st.cache_resource
 def get_embedding_model():
     # ... (this function remains the same)
     return SentenceTransformer('all-MiniLM-L6-v2')
 
-def build_faiss_index(source_content, chunk_size=1500, chunk_overlap=200):
+def build_faiss_index(source_content, chunk_size=1500, chunk_overlap=200, deduplicate=False):
     """
     A generic function to take a dictionary of texts, chunk them,
     and return the chunks and a ready-to-use FAISS index.
+    With `deduplicate=True`, near-identical chunks are collapsed before embedding.
     """
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     all_chunks = []
@@ -25,6 +27,10 @@ def build_faiss_index(source_content, chunk_size=1500, chunk_overlap=200):
     if not all_chunks:
         return None, None
 
+    if deduplicate:
+        all_chunks, stats = deduplication.deduplicate_chunks(all_chunks)
+        print(f"  -> Deduplicated {stats['original']} chunks to {stats['deduplicated']} (shrink ratio: {stats['shrink_ratio']:.1%})")
+
     embedding_model = get_embedding_model()
     chunk_texts = [chunk['text'] for chunk in all_chunks]
     
@@ -55,8 +61,9 @@ def retrieve_context(query, chunks, index, top_k=3):
     for idx in indices[0]:
         if idx != -1:
             chunk_info = chunks[idx]
-            sources.add(chunk_info['source'])
-            context += f"--- Context from: {chunk_info['source']} ---\n"
+            chunk_sources = chunk_info.get('sources', [chunk_info['source']])
+            sources.update(chunk_sources)
+            context += f"--- Context from: {', '.join(chunk_sources)} ---\n"
             context += f"{chunk_info['text']}\n\n"
             
     return context, list(sources)
\ No newline at end of file
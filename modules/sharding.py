@@ -0,0 +1,213 @@
+# modules/sharding.py
+import os
+import re
+import json
+import pickle
+import shutil
+import numpy as np
+import faiss
+from concurrent.futures import ThreadPoolExecutor
+from modules import quantization
+
+MANIFEST_FILE = "manifest.json"
+# Routed shard search is approximate (only the top-N shards are searched), so it is opt-in.
+USE_SHARDS = os.environ.get("KB_USE_SHARDS", "0") == "1"
+TOP_N_SHARDS = int(os.environ.get("KB_TOP_N_SHARDS", "3"))
+
+def _shard_slug(name):
+    """Turns a source name (e.g. 'Pub 15-B' or 'CA_v_Texas.pdf') into a safe file stem."""
+    return re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_').lower()
+
+def _centroid(vectors):
+    """Normalized mean of a shard's vectors, used by the router for cosine scoring."""
+    centroid = vectors.mean(axis=0)
+    norm = np.linalg.norm(centroid)
+    return centroid / norm if norm > 0 else centroid
+
+def shard_faiss_index(chunks, index):
+    """
+    Splits a monolithic (chunks, index) pair from `retriever.build_faiss_index`
+    into one shard per source, reusing the stored vectors instead of re-embedding.
+    A deduplicated chunk is added to the shard of every source in its 'sources'
+    list, so shared boilerplate stays findable from each publication's shard.
+    Returns a dictionary of {source: (shard_chunks, shard_index)}.
+    """
+    vectors = index.reconstruct_n(0, index.ntotal)
+    positions_by_source = {}
+    for position, chunk in enumerate(chunks):
+        for source in chunk.get('sources', [chunk['source']]):
+            positions_by_source.setdefault(source, []).append(position)
+
+    shards = {}
+    for source, positions in positions_by_source.items():
+        shard_index = faiss.IndexFlatL2(index.d)
+        shard_index.add(vectors[positions])
+        shards[source] = ([chunks[p] for p in positions], shard_index)
+    return shards
+
+def save_shard(shard_dir, name, chunks, index):
+    """Writes a single shard and records it in the shard directory's manifest."""
+    os.makedirs(shard_dir, exist_ok=True)
+    slug = _shard_slug(name)
+    quantization.save_index_formats(index, os.path.join(shard_dir, slug))
+    with open(os.path.join(shard_dir, f"{slug}.pkl"), "wb") as f:
+        pickle.dump(chunks, f)
+
+    manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    manifest[name] = {
+        "file": slug,
+        "num_chunks": len(chunks),
+        "centroid": _centroid(index.reconstruct_n(0, index.ntotal)).tolist(),
+    }
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def save_shards(shards, shard_dir):
+    """Writes every shard produced by `shard_faiss_index` to `shard_dir`, replacing its manifest."""
+    manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    for name, (chunks, index) in shards.items():
+        save_shard(shard_dir, name, chunks, index)
+
+def rebuild_shard(kb_root, kb_name, source, text):
+    """
+    Re-embeds a single source (e.g. one updated publication) without touching the
+    live snapshot, whose files workers may have memory-mapped. The live snapshot
+    is copied into a new one, `source`'s shard in `<kb_name>_shards` and its rows
+    in the monolithic index are replaced there, and the new snapshot is published
+    so the app hot-swaps it in (with or without KB_USE_SHARDS). The new chunks are
+    only deduplicated within `source`; run a full build to deduplicate across sources.
+    Returns the new snapshot version.
+    """
+    from modules import retriever, kb_snapshots
+    live_version, live_path = kb_snapshots.current_snapshot(kb_root)
+    if live_version is None:
+        raise FileNotFoundError(f"'{kb_root}' has no published snapshot to rebuild a shard in.")
+
+    version, path = kb_snapshots.new_snapshot_dir(kb_root)
+    try:
+        shutil.copytree(live_path, path, dirs_exist_ok=True)
+        # The copied manifest is rewritten on publish; until then this snapshot is unpublished
+        os.remove(os.path.join(path, kb_snapshots.MANIFEST_FILE))
+        chunks, index = retriever.build_faiss_index({source: text}, deduplicate=True)
+        if index is None:
+            raise ValueError(f"No chunks produced for '{source}'.")
+        save_shard(os.path.join(path, f"{kb_name}_shards"), source, chunks, index)
+        _replace_monolithic_rows(path, kb_name, source, chunks, index)
+        kb_snapshots.publish_snapshot(kb_root, version, {"rebuilt_shard": f"{kb_name}/{source}", "based_on": live_version})
+    except Exception:
+        kb_snapshots.discard_snapshot(kb_root, version)
+        raise
+    return version
+
+def _replace_monolithic_rows(snapshot_dir, kb_name, source, chunks, index):
+    """
+    Swaps `source`'s chunks and vectors in the snapshot's monolithic index for the
+    rebuilt ones. Deduplicated chunks shared with other sources are kept, minus `source`.
+    """
+    index_stem = os.path.join(snapshot_dir, f"{kb_name}_faiss_index")
+    chunks_path = os.path.join(snapshot_dir, f"{kb_name}_chunks.pkl")
+    if not os.path.exists(f"{index_stem}.bin"):
+        return
+    old_index = faiss.read_index(f"{index_stem}.bin")
+    old_vectors = old_index.reconstruct_n(0, old_index.ntotal)
+    with open(chunks_path, "rb") as f:
+        old_chunks = pickle.load(f)
+
+    kept_chunks, kept_positions = [], []
+    for position, chunk in enumerate(old_chunks):
+        remaining = [s for s in chunk.get('sources', [chunk['source']]) if s != source]
+        if not remaining:
+            continue
+        if 'sources' in chunk:
+            chunk = {**chunk, 'source': remaining[0], 'sources': remaining}
+        kept_chunks.append(chunk)
+        kept_positions.append(position)
+
+    new_index = faiss.IndexFlatL2(old_index.d)
+    new_index.add(np.vstack([old_vectors[kept_positions], index.reconstruct_n(0, index.ntotal)]))
+    # These are the snapshot's own copies, not the live (memory-mapped) files
+    quantization.save_index_formats(new_index, index_stem)
+    with open(chunks_path, "wb") as f:
+        pickle.dump(kept_chunks + chunks, f)
+
+def load_shards(shard_dir, top_n_shards=None):
+    """
+    Loads a shard directory into a (chunks, index) pair that can be passed to
+    `retriever.retrieve_context` exactly like a monolithic knowledge base.
+    Chunks stored in several shards appear once in the returned chunk list.
+    Returns (None, None) if the directory has no manifest.
+    """
+    manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None, None
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    all_chunks, shard_entries, global_ids = [], [], {}
+    for name, entry in manifest.items():
+        index = quantization.load_index(os.path.join(shard_dir, entry['file']))
+        with open(os.path.join(shard_dir, f"{entry['file']}.pkl"), "rb") as f:
+            chunks = pickle.load(f)
+        id_map = []
+        for chunk in chunks:
+            if chunk['text'] not in global_ids:
+                global_ids[chunk['text']] = len(all_chunks)
+                all_chunks.append(chunk)
+            id_map.append(global_ids[chunk['text']])
+        shard_entries.append((name, index, np.array(id_map, dtype='int64'), entry["centroid"]))
+    return all_chunks, ShardedIndex(shard_entries, top_n_shards=top_n_shards or TOP_N_SHARDS)
+
+class ShardedIndex:
+    """
+    Routes each query to the top-N shards by centroid similarity, searches them
+    in parallel and merges the hits. Exposes the same `search`/`ntotal`/`d`
+    surface as a FAISS index so the rest of the retriever stays unchanged;
+    each shard's `id_map` maps its local ids into the chunk list from `load_shards`.
+    """
+    def __init__(self, shard_entries, top_n_shards=3, max_workers=None):
+        self.names = [name for name, _, _, _ in shard_entries]
+        self.indexes = [index for _, index, _, _ in shard_entries]
+        self.id_maps = [id_map for _, _, id_map, _ in shard_entries]
+        self.centroids = np.array([centroid for _, _, _, centroid in shard_entries], dtype='float32')
+        self.top_n_shards = top_n_shards
+        self.ntotal = len(set().union(*(id_map.tolist() for id_map in self.id_maps)))
+        self.d = self.indexes[0].d if self.indexes else 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or min(8, max(1, top_n_shards)))
+
+    def route(self, query_embedding, top_n=None):
+        """Returns the positions of the shards whose centroids best match the query."""
+        top_n = min(top_n or self.top_n_shards, len(self.indexes))
+        scores = self.centroids @ query_embedding
+        return list(np.argsort(-scores)[:top_n])
+
+    def _search_shard(self, shard, query_embedding, top_k):
+        distances, indices = self.indexes[shard].search(query_embedding[None, :], min(top_k, self.indexes[shard].ntotal))
+        id_map = self.id_maps[shard]
+        return [(dist, id_map[idx]) for dist, idx in zip(distances[0], indices[0]) if idx != -1]
+
+    def search(self, query_embeddings, top_k):
+        query_embeddings = np.asarray(query_embeddings, dtype='float32')
+        all_distances = np.full((len(query_embeddings), top_k), np.inf, dtype='float32')
+        all_indices = np.full((len(query_embeddings), top_k), -1, dtype='int64')
+
+        for row, query_embedding in enumerate(query_embeddings):
+            shards = self.route(query_embedding)
+            futures = [self._executor.submit(self._search_shard, shard, query_embedding, top_k) for shard in shards]
+            # A shared chunk can come back from several shards; keep its best hit once
+            best = {}
+            for dist, idx in (hit for future in futures for hit in future.result()):
+                if idx not in best or dist < best[idx]:
+                    best[idx] = dist
+            hits = sorted(((dist, idx) for idx, dist in best.items()), key=lambda hit: hit[0])[:top_k]
+            for col, (dist, idx) in enumerate(hits):
+                all_distances[row, col] = dist
+                all_indices[row, col] = idx
+        return all_distances, all_indices
@@ -0,0 +1,25 @@
+# rebuild_shard.py
+# Rebuilds a single IRS publication or legal case PDF (its shard and its rows in
+# the monolithic index) into a new published snapshot, e.g.
+# `python rebuild_shard.py "Pub 969"` or `python rebuild_shard.py "CA_v_Texas.pdf"`.
+import sys
+from modules import data_acquisition, sharding
+
+if len(sys.argv) != 2:
+    print("Usage: python rebuild_shard.py <publication name from publications.json | case PDF filename>")
+    sys.exit(1)
+source = sys.argv[1]
+
+publication_urls = data_acquisition.load_urls_from_file()
+if source in publication_urls:
+    kb_name, text = "irs", data_acquisition.scrape_publication(source, publication_urls[source])
+else:
+    kb_name, text = "cases", data_acquisition.extract_text_from_pdfs("source_documents/legal_cases").get(source)
+
+if not text:
+    print(f"⚠️ Could not load any text for '{source}'. Nothing was rebuilt.")
+    sys.exit(1)
+
+print(f"🚀 Rebuilding the '{kb_name}' shard for '{source}'...")
+version = sharding.rebuild_shard("knowledge_stores", kb_name, source, text)
+print(f"✅ Published snapshot '{version}' with '{source}' rebuilt in both the monolithic index and its shard.")